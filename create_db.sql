@@ -11,6 +11,10 @@ CREATE TABLE Notes (
 	alias text
 );
 
+CREATE INDEX idx_notes_status ON Notes(status_id);
+
+CREATE UNIQUE INDEX uniq_notes_alias ON Notes(alias) WHERE alias IS NOT NULL;
+
 CREATE TABLE Alias (
 	notes_id integer,
 	alias text,
@@ -37,6 +41,10 @@ CREATE TABLE Nest (
 	Child integer
 );
 
+CREATE INDEX idx_nest_child ON Nest(child);
+
+CREATE INDEX idx_nest_parent ON Nest(parent);
+
 CREATE TABLE Files (
 	file_id integer PRIMARY KEY AUTOINCREMENT,
 	file blob
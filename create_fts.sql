@@ -0,0 +1,35 @@
+--full text index over Notes.description, kept in step by triggers
+
+BEGIN;
+
+CREATE VIRTUAL TABLE NotesFts USING fts5(
+	description,
+	content = 'Notes',
+	content_rowid = 'notes_id',
+	tokenize = 'trigram'
+);
+
+CREATE TRIGGER notes_fts_insert
+AFTER INSERT ON Notes
+BEGIN
+    INSERT INTO NotesFts(rowid, description) VALUES (NEW.notes_id, NEW.description);
+END;
+
+CREATE TRIGGER notes_fts_delete
+AFTER DELETE ON Notes
+BEGIN
+    INSERT INTO NotesFts(NotesFts, rowid, description) VALUES ('delete', OLD.notes_id, OLD.description);
+END;
+
+CREATE TRIGGER notes_fts_update
+AFTER UPDATE OF description ON Notes
+BEGIN
+    INSERT INTO NotesFts(NotesFts, rowid, description) VALUES ('delete', OLD.notes_id, OLD.description);
+    INSERT INTO NotesFts(rowid, description) VALUES (NEW.notes_id, NEW.description);
+END;
+
+--index notes that already exist
+
+INSERT INTO NotesFts(NotesFts) VALUES ('rebuild');
+
+COMMIT;
@@ -4,22 +4,25 @@
 JOT is a note taking and task management tool 
 """
 
+# only modules needed to list notes are imported here (json binds the id and
+# status lists and loads re itself); argparse, pydoc, subprocess and tempfile
+# are imported where they are used to keep startup fast
 import sys
 import sqlite3
-import tempfile
 import os
-import argparse
+import json
+import re
 from datetime import datetime
-import subprocess
-import pydoc
-import math
+from collections import defaultdict
+from types import SimpleNamespace
 
 
 class Jot:
     def __init__(self, **kwargs):
         self.defaults()
-        self.connect()
         self.parse_inputs()
+        if self.needs_db():
+            self.connect()
         self.main()
 
     def defaults(self):
@@ -29,7 +32,13 @@ class Jot:
         self.snippet_width = 48
         self.palette = [248, 217,  46,  34, 136,  36, 147,  15, 180] # see ansi 256 color codes: https://www.ditig.com/256-colors-cheat-sheet
              #      [border, -->, [ ], [x], [0], [/], ind, defa, full note]
-
+        ### ansi escape for every (palette index, style) pair, built once rather than per row
+        self.ansi = {(c, style): self.style_parser(color, style) for c, color in enumerate(self.palette) for style in (0, 3, 5)}
+        self.note_line_str = None
+        self.note_header_str = None
+        self.gen_symbols = {}
+        ### fixed width summary row: | date | status | id | note snippet | end marker; padding and truncation done by str.format
+        self.summary_template = '| {:^10} {:|^3}{:>5} {:<' + str(self.snippet_width) + '.' + str(self.snippet_width) + '}{} '
 
         ### Defaults
         #### windows config
@@ -45,53 +54,101 @@ class Jot:
             
         ## Directories
         self.JOT_DIR = os.path.dirname(sys.argv[0])
-        ### Set DB dir to contents of DB_DIR if existing, otherwise, same as JOT_DIR
-        DB_DIR = os.path.join(self.JOT_DIR, 'DB_DIR')
-        if os.path.exists(DB_DIR):
-            with open(DB_DIR, 'r') as f:
-                self.DB_DIR = f.read().strip()
-        else:
-            self.DB_DIR = self.JOT_DIR
-        ### Set DB_NAME to contents of DB_NAME if existing, otherwise, jot.sqlite
-        DB_NAME = os.path.join(self.DB_DIR, 'DB_NAME')
-        if os.path.exists(DB_NAME):
-            with open(DB_NAME, 'r') as f:
-                self.DB_NAME = f.read().strip()
-        else:
-            self.DB_NAME = 'jot.sqlite'
+        ### Set DB dir to $JOT_DB_DIR if set, else contents of DB_DIR if existing, otherwise, same as JOT_DIR
+        self.DB_DIR = os.environ.get('JOT_DB_DIR') or self.read_setting(os.path.join(self.JOT_DIR, 'DB_DIR'), self.JOT_DIR)
+        ### Set DB_NAME to $JOT_DB_NAME if set, else contents of DB_NAME if existing, otherwise, jot.sqlite
+        self.DB_NAME = os.environ.get('JOT_DB_NAME') or self.read_setting(os.path.join(self.DB_DIR, 'DB_NAME'), 'jot.sqlite')
         self.DB = os.path.join(self.DB_DIR, self.DB_NAME)
+        self.DB_VERSION = 4 # bump and add a step to migrate() when the schema changes
+
+    def read_setting(self, path, default):
+        # one open per setting file; a missing file means the default
+        try:
+            with open(path, 'r') as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return default
 
     def style_parser(self, color = 15, style = 0):
         return '\x1b[' + str(style) + ';38;5;' + str(color) + 'm'
 
     def connect(self):
+        self.tree = None
+        self.row_cache = {}
         undefined_db = not os.path.exists(self.DB)
         if undefined_db:
             print('creating new database: ' + self.DB)
             self.conn = sqlite3.connect(self.DB)
             self.cursor = self.conn.cursor()
+            self.set_pragmas()
             sql_file = open(os.path.join(self.JOT_DIR, "create_db.sql"))
             sql_as_string = sql_file.read()
             self.cursor.executescript(sql_as_string)
+            self.cursor.execute('PRAGMA user_version = ' + str(self.DB_VERSION))
             self.conn.commit()
+            self.create_fts()
         else:
             try:
                 self.conn = sqlite3.connect(self.DB)
                 self.cursor = self.conn.cursor()
-
-                # this block can be dropped once legacy versions are all updated
-                self.cursor.execute('update Notes set status_id = 1 where status_id is null;') # set default status = 1 where missing - this line can be dropped once legacy versions are all updated
-                try:
-                    self.cursor.execute('alter table Notes add column Priority int;') # this line can be dropped once legacy versions are all updated
-                    self.cursor.execute('alter table Notes add column Alias text;') # this line can be dropped once legacy versions are all updated
-                except:
-                    'nothing at all to do here, table already up to date'
-                self.conn.commit()
-
+                self.set_pragmas()
+                self.migrate()
+                self.create_fts()
             except:
                 print ('attempting to connect to ' + self.JOT_DIR)
                 sys.exit(_("Connection to sqlite db failed!"))
     
+    def migrate(self):
+        # bring databases from older versions up to date; user_version records the last step applied
+        version = self.cursor.execute('PRAGMA user_version').fetchone()[0]
+        if version >= self.DB_VERSION:
+            return
+        with self.conn:
+            if version < 1:
+                self.cursor.execute('update Notes set status_id = 1 where status_id is null;') # set default status = 1 where missing
+                try:
+                    self.cursor.execute('alter table Notes add column Priority int;')
+                    self.cursor.execute('alter table Notes add column Alias text;')
+                except:
+                    'nothing at all to do here, table already up to date'
+            if version < 2:
+                self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_notes_status ON Notes(status_id);')
+            if version < 3:
+                # keep the oldest holder of any duplicated alias so the unique index can be built
+                duplicates = 'alias IS NOT NULL AND notes_id NOT IN (SELECT min(notes_id) FROM Notes WHERE alias IS NOT NULL GROUP BY alias)'
+                for note_id, alias in self.cursor.execute('SELECT notes_id, alias FROM Notes WHERE ' + duplicates + ' ORDER BY notes_id').fetchall():
+                    print("Alias '" + alias + "' removed from note " + str(note_id) + ', it is already used by an older note')
+                self.cursor.execute('UPDATE Notes SET alias = NULL WHERE ' + duplicates + ';')
+                self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS uniq_notes_alias ON Notes(alias) WHERE alias IS NOT NULL;')
+            if version < 4:
+                self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_nest_child ON Nest(child);')
+                self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_nest_parent ON Nest(parent);')
+            self.cursor.execute('PRAGMA user_version = ' + str(self.DB_VERSION))
+
+    def create_fts(self):
+        # full text index used by --find; also added to databases created before it existed
+        self.fts = self.cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'NotesFts'").fetchone() is not None
+        if not self.fts:
+            try:
+                with open(os.path.join(self.JOT_DIR, "create_fts.sql")) as sql_file:
+                    self.cursor.executescript(sql_file.read())
+                self.fts = True
+            except (sqlite3.OperationalError, OSError):
+                self.conn.rollback() # sqlite built without fts5 or create_fts.sql missing, searching falls back to LIKE
+
+    def set_pragmas(self):
+        # WAL with synchronous = NORMAL only syncs at checkpoints rather than on every commit;
+        # busy_timeout lets a second jot wait briefly for a writer instead of failing with 'database is locked'
+        self.cursor.executescript('''
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            PRAGMA temp_store = MEMORY;
+            PRAGMA busy_timeout = 5000;
+            PRAGMA cache_size = -20000;
+            PRAGMA mmap_size = 134217728;
+            PRAGMA foreign_keys = ON;
+            ''')
+
     def set_db_dir(self, path):
         if path == 'pwd':
             path = os.getcwd()
@@ -99,6 +156,7 @@ class Jot:
             f.write(path)
         self.DB_DIR = path
         self.DB = os.path.join(self.DB_DIR, self.DB_NAME)
+        self.note_header_str = None
     
     def set_db_name(self, name):
         name = name + '.sqlite'
@@ -106,120 +164,107 @@ class Jot:
             f.write(name)
         self.DB_NAME = name
         self.DB = os.path.join(self.DB_DIR, self.DB_NAME)
+        self.note_header_str = None
 
-    def flatten2set(self, object):
-        gather = []
-        for item in object:
-            if isinstance(item, (list, tuple, set)):
-                gather.extend(self.flatten2set(item))            
-            else:
-                gather.append(item)
-        return set(gather)
-    
-    def flatten2list(self, object):
-        gather = []
-        for item in object:
-            if isinstance(item, (list, tuple, set)):
-                gather.extend(self.flatten2list(item))            
-            else:
-                gather.append(item)
-        return list(gather)
-    
     def gen_symbol(self, gen):
-        if gen == 0:
-            return ['']
-        elif gen == 1:
-            return ['>'.ljust(gen, '>') + ' ']
-        elif gen > 1:
-            return ['>'.rjust(gen, '-') + ' ']
-        elif gen == -1:
-            return ['? ']
+        if gen not in self.gen_symbols:
+            if gen == 0:
+                self.gen_symbols[gen] = ['']
+            elif gen == 1:
+                self.gen_symbols[gen] = ['>'.ljust(gen, '>') + ' ']
+            elif gen > 1:
+                self.gen_symbols[gen] = ['>'.rjust(gen, '-') + ' ']
+            elif gen == -1:
+                self.gen_symbols[gen] = ['? ']
+        return self.gen_symbols.get(gen)
     
     def smart_wrap(self, text, width):
-        text_list = text.split('\n')
-        if not isinstance(text_list, list):
-            text_list = [text_list]
         wrap = []
-        for line in text_list:
+        for line in text.split('\n'):
             indent = len(line) - len(line.lstrip())
             n = width - indent
             line = line[indent:]
-            wrap.append('\n'.join([(''.ljust(indent if i == 0 else indent + 2) + line[i:i+n]) for i in range(0, len(line), n)]))
+            # first chunk keeps the line's indent, continuation chunks get two more spaces
+            chunks = [line[i:i+n] for i in range(0, len(line), n)]
+            if not chunks:
+                wrap.append('')
+                continue
+            pad = '\n' + ' ' * (indent + 2)
+            wrap.append(' ' * indent + chunks[0] + ''.join(pad + c for c in chunks[1:]))
         return '\n'.join(wrap)
 
-    def print_formatted(self, row, gen = 0, find = None, full = False):
+    def note_formatted(self, row, gen = 0, find = None, full = False):
+        # returns the output lines for one note; callers write them out in one go
+        out = []
         result = self.summary_formatted(row, gen = gen)
         if result:
-            print(result)
+            out.append(result)
             if full:
                 if len(row[3]) > self.snippet_width:
                     if self.colorize:
-                        [print(self.style_parser(self.palette[0], 0) + '| ' + \
-                            self.style_parser(self.palette[8], 0) + i.ljust(self.snippet_width + 20) + \
-                            self.style_parser(self.palette[0], 0) + '|') 
-                            for i in self.smart_wrap(row[3], width = self.snippet_width + 20).split('\n')]
+                        out.extend(self.ansi[(0, 0)] + '| ' + \
+                            self.ansi[(8, 0)] + i.ljust(self.snippet_width + 20) + \
+                            self.ansi[(0, 0)] + '|'
+                            for i in self.smart_wrap(row[3], width = self.snippet_width + 20).split('\n'))
                     else:
-                        [print('| ' + i.ljust(self.snippet_width + 20) + '|') 
-                            for i in self.smart_wrap(row[3], width = self.snippet_width + 20).split('\n')]
-                print(self.note_line())
+                        out.extend('| ' + i.ljust(self.snippet_width + 20) + '|'
+                            for i in self.smart_wrap(row[3], width = self.snippet_width + 20).split('\n'))
+                out.append(self.note_line())
 
             if find:
                 wid = self.snippet_width - len(find)
-                widh1 = math.ceil(wid/2)
-                widh2 = math.floor(wid/2)
-                snip = [i for i in row[3].lower().split('\n') if i.find(self.args.find.lower())>=0] 
-                for line in snip:
-                    context = ('~' + line + '~').split(find.lower())
-                    if len(line) > wid:
-                        context = ('~' + line + '~').split(find.lower())
-                        context_wid = [len(i) for i in context][0:2]
-                        if sum(context_wid) > wid:
-                            if context_wid[0] > widh1 and context_wid[1] > widh2:
-                                line = context[0][-widh1:] + find.upper() + context[1][:widh2] 
-                            elif context_wid[0] > widh1:
-                                line = context[0][-(wid-context_wid[1]):] + find.upper() + context[1]
-                            else:
-                                line = context[0] + find.upper() + context[1][:wid-context_wid[0]]
+                widh2 = wid // 2
+                widh1 = wid - widh2
+                text = row[3]
+                line_start = -1
+                for match in self.find_re.finditer(text):
+                    start = text.rfind('\n', 0, match.start()) + 1
+                    if start == line_start: # one snippet per line, centred on its first match
+                        continue
+                    line_start = start
+                    stop = text.find('\n', match.end())
+                    stop = len(text) if stop < 0 else stop
+                    context = ['~' + text[start:match.start()].lower(), text[match.end():stop].lower() + '~']
+                    context_wid = [len(i) for i in context]
+                    found = match.group().upper()
+                    if sum(context_wid) > wid:
+                        if context_wid[0] > widh1 and context_wid[1] > widh2:
+                            line = context[0][-widh1:] + found + context[1][:widh2] 
+                        elif context_wid[0] > widh1:
+                            line = context[0][-(wid-context_wid[1]):] + found + context[1]
+                        else:
+                            line = context[0] + found + context[1][:wid-context_wid[0]]
                     else:
-                        line = context[0] + find.upper() + context[1]
-                    print(self.colorize_summary('|                     ' + line.ljust(self.snippet_width) + '|'))
+                        line = context[0] + found + context[1]
+                    out.append(self.colorize_summary('|                     ' + line.ljust(self.snippet_width) + '|'))
+        return out
     
     def summary_formatted(self, row, gen = 0):
-        gen_parts = self.gen_symbol(gen)
-        sts_str = (row[9] if row[9] else '').center(3, '|')
-        gen_str = gen_parts[0]
-        
+        gen_str = self.gen_symbol(gen)[0]
         idWidth = 5
-        sym_len = 0
-        multiline = '\n' in row[3] 
-        note_summary = gen_str + row[3].split('\n')[0]
-        nslen0 = len(note_summary)
-        tooLong = nslen0 > self.snippet_width 
-        chr_key = ['|', '~', 'v', '&']
-        if tooLong and multiline:
-            end_chr = 3
-        elif tooLong: # and not multiline
-            end_chr = 1 
-        elif multiline: # and not too long
-            end_chr = 2 
-        else:
-            end_chr = 0
-        note_summary = note_summary[:self.snippet_width].ljust(self.snippet_width) + chr_key[end_chr]
-        due_str = (row[2] if row[2] else '').center(10)
-        id_str = row[7][:idWidth].rjust(idWidth) if row[7] else str(row[0]).rjust(idWidth)
-        note_str = note_summary
-        plain_summary = '| ' + due_str + ' ' + sts_str + '' + id_str + ' ' + note_str + ' '
+        # one scan up to the first newline, no copies of the rest of the body
+        nl = row[3].find('\n')
+        multiline = nl >= 0
+        note_summary = gen_str + (row[3][:nl] if multiline else row[3])
+        tooLong = len(note_summary) > self.snippet_width
+        # end_chr: 0 plain, 1 too long, 2 multiline, 3 both
+        end_chr = tooLong + 2 * multiline
+        plain_summary = self.summary_template.format(
+            row[2] if row[2] else '',
+            row[9] if row[9] else '',
+            row[7][:idWidth] if row[7] else row[0],
+            note_summary,
+            '|~v&'[end_chr])
         return(self.colorize_summary(plain_summary, gen, row[8], end_chr))
     
     def colorize_summary(self, my_str, gen = 0, status_id = 0, trim_key = 0):
         if self.colorize:
-            palette = self.palette
-            note_col = palette[0:6]
+            ansi = self.ansi
             sty = {}
-            sty[0] = self.style_parser(palette[7], 0)
-            sty['ind'] = self.style_parser(palette[0] if status_id == 0 else palette[6], 3)
-            sty['note'] = self.style_parser(note_col[status_id], 0)
-            sty['end'] = self.style_parser(palette[0], 0 if trim_key == 0 else 5)
+            sty[0] = ansi[(7, 0)]
+            sty['ind'] = ansi[(0 if status_id == 0 else 6, 3)]
+            sty['note'] = ansi[(status_id, 0)] # note colours are palette[0:6]
+            sty['end'] = ansi[(0, 0 if trim_key == 0 else 5)]
             sty['date'] = sty['note']
             sty['stat'] = sty['note'] 
             mydate = sty['date'] + my_str[1:13]
@@ -234,45 +279,52 @@ class Jot:
         else:
             return(my_str)
    
-    def search_notes(self, term):
-        sql = ''' SELECT notes_id FROM Notes WHERE description LIKE ? '''
-        found_id = self.cursor.execute(sql, ('%' + term + '%',)).fetchall()
-        found_id = [tuple([i[0] for i in found_id])][0] # list of tuples to tuple for sqlite input format
-        return found_id
-
-    def find_children(self, parent, gen):
-        sql = ''' SELECT child FROM Nest WHERE parent = ? '''
-        children = list(sum(self.cursor.execute(sql, (parent,)).fetchall(), ()))
-        nest = [parent, gen, [self.find_children(child, gen+1) for child in children]]
-        return nest
-    
     def family_tree(self):
-        sql_parents = ' SELECT parent FROM Nest '
-        sql_children = ' SELECT child FROM Nest '
-        parents = self.flatten2set(self.cursor.execute(sql_parents).fetchall())
-        children = self.flatten2set(self.cursor.execute(sql_children).fetchall())
-        last_children = children - parents
-        parent_children = children - last_children
-        first_parents = list(parents - parent_children)
-        first_parents.sort()
-        tree = list([self.find_children(parents, 1) for parents in first_parents])
-        return tree, parent_children 
+        # flat, depth first list of (id, gen) for every nested note, from a single read of Nest
+        if self.tree is None:
+            sql_nest = ' SELECT parent, child FROM Nest '
+            children_of = defaultdict(list)
+            parents = set()
+            children = set()
+            for parent, child in self.cursor.execute(sql_nest):
+                children_of[parent].append(child)
+                parents.add(parent)
+                children.add(child)
+            last_children = children - parents
+            parent_children = children - last_children
+            first_parents = list(parents - parent_children)
+            first_parents.sort()
+            tree = []
+            # entries are pushed in reverse so they pop in order; path guards against circular links
+            stack = [(parent, 1, ()) for parent in reversed(first_parents)]
+            while stack:
+                node, gen, path = stack.pop()
+                tree.append((node, gen))
+                path = path + (node,)
+                stack.extend((child, gen + 1, path) for child in reversed(children_of[node]) if child not in path)
+            self.tree = (tree, parent_children)
+        return self.tree
     
     def note_line(self):
-        return self.colorize_summary('+------------+-+-----+' + ''.ljust(self.snippet_width, '-') + '+')
+        if self.note_line_str is None:
+            self.note_line_str = self.colorize_summary('+------------+-+-----+' + ''.ljust(self.snippet_width, '-') + '+')
+        return self.note_line_str
 
     def note_header(self):
-        return self.colorize_summary('|     Date   |?|  ID   Note ' + self.DB.rjust(self.snippet_width-7) + ' |')
-    
+        if self.note_header_str is None: # depends on self.DB, reset by set_db_dir/set_db_name
+            self.note_header_str = self.colorize_summary('|     Date   |?|  ID   Note ' + self.DB.rjust(self.snippet_width-7) + ' |')
+        return self.note_header_str
+
+    def note_banner(self):
+        return self.note_line() + '\n' + self.note_header() + '\n' + self.note_line()
+
     def nest_notes(self, my_ids):
         # calculate nesting of items
         tree, parent_children = self.family_tree()
-        id_gen = self.flatten2list(tree)
         # filter nested items
-        id_gen = [[i, g] for i, g in zip(id_gen[::2], id_gen[1::2]) if i in my_ids]
-        id_gen = self.flatten2list(id_gen)
-        ids = id_gen[::2]
-        gens = id_gen[1::2]
+        my_id_set = set(my_ids)
+        ids = [i for i, g in tree if i in my_id_set]
+        gens = [g for i, g in tree if i in my_id_set]
         # add unresolved nested items that are in my_ids
         circular = parent_children - set(ids) & set(my_ids)
         circular = list(circular)
@@ -287,51 +339,78 @@ class Jot:
         gens.extend([0] * len(free))
         return ids, gens
 
-    def print_nested(self, my_ids, find, full=False):
+    def nested_formatted(self, my_ids, find, full=False):
         ids, gens = self.nest_notes(my_ids)
-        [self.print_formatted(self.query_row(i), g, find, full) for i, g in zip(ids, gens)]
+        rows = self.query_rows(ids)
+        out = []
+        for i, g in zip(ids, gens):
+            out.extend(self.note_formatted(rows[i], g, find, full))
+        return out
 
-    def print_flat(self, my_ids, find, full=False):
+    def flat_formatted(self, my_ids, find, full=False):
         my_ids = my_ids if isinstance(my_ids, list) else [my_ids]
-        [self.print_formatted(self.query_row(i), 0, find, full) for i in my_ids]
+        rows = self.query_rows(my_ids)
+        out = []
+        for i in my_ids:
+            out.extend(self.note_formatted(rows[i], 0, find, full))
+        return out
 
     def print_notes(self, mode = 'nested', status_show = (1,2,3,4,5), find = None, full = False):
+        # lists are bound as one json array so each statement shape is prepared once
         sql = "SELECT notes_id FROM Notes \
-        WHERE status_id IN ({seq})".format(seq=','.join(['?']*len(status_show)))
-        sql_vars = status_show
+        WHERE status_id IN (SELECT value FROM json_each(?))"
+        sql_vars = (json.dumps(status_show),)
 
-        # filter on search term if provided
+        # filter on search term if provided, in the same statement as the status filter
         if find:
-            found = self.search_notes(find)
-            if found is not None:
-                sql = sql + " AND notes_id IN ({nid})".format(nid=','.join(['?']*len(found)))
-                sql_vars = sql_vars + found
+            self.find_re = re.compile(re.escape(find), re.IGNORECASE)
+            if self.fts and len(find) >= 3: # the trigram index needs at least 3 characters
+                sql = sql + " AND notes_id IN (SELECT rowid FROM NotesFts WHERE NotesFts MATCH ?)"
+                sql_vars = sql_vars + ('"' + find.replace('"', '""') + '"',)
+            else:
+                sql = sql + " AND description LIKE ?"
+                sql_vars = sql_vars + ('%' + find + '%',)
         
-        my_ids = list(sum(self.cursor.execute(sql, sql_vars).fetchall(), ()))
-        print(self.note_line() + '\n' + self.note_header() + '\n' + self.note_line())
+        sql = sql + " ORDER BY notes_id" # the status index would otherwise return rows grouped by status
+        my_ids = [i[0] for i in self.cursor.execute(sql, sql_vars)]
+        # banner, rows and footer go out in a single write
+        out = [self.note_banner()]
         if mode == 'flat':
-            self.print_flat(my_ids, find, full)
+            out.extend(self.flat_formatted(my_ids, find, full))
         elif mode == 'nested':
-            self.print_nested(my_ids, find, full)
-        print(self.note_line())
+            out.extend(self.nested_formatted(my_ids, find, full))
+        out.append(self.note_line())
+        sys.stdout.write('\n'.join(out) + '\n')
     
     def display_note(self, note_id):
-        print(self.note_line() + '\n' + self.note_header() + '\n' + self.note_line())
-        self.print_flat(note_id, find = None, full = True)
+        out = [self.note_banner()] + self.flat_formatted(note_id, find = None, full = True)
+        sys.stdout.write('\n'.join(out) + '\n')
         
     def query_row(self, note_id):
-        sql = ''' SELECT * FROM Notes LEFT JOIN Status ON Notes.status_id = Status.status_id WHERE notes_id = ? '''
-        self.cursor.execute(sql, (note_id,))
-        row = self.cursor.fetchone()
-        return(row)
-    
+        if note_id not in self.row_cache:
+            sql = ''' SELECT * FROM Notes LEFT JOIN Status ON Notes.status_id = Status.status_id WHERE notes_id = ? '''
+            self.cursor.execute(sql, (note_id,))
+            row = self.cursor.fetchone()
+            if not row:
+                return(row)
+            self.row_cache[note_id] = row
+        return(self.row_cache[note_id])
+
+    def query_rows(self, note_ids):
+        missing = [i for i in set(note_ids) if i not in self.row_cache]
+        if missing:
+            sql = ''' SELECT * FROM Notes LEFT JOIN Status ON Notes.status_id = Status.status_id WHERE notes_id IN (SELECT value FROM json_each(?)) '''
+            self.row_cache.update({row[0]: row for row in self.cursor.execute(sql, (json.dumps(missing),))})
+        return self.row_cache
+
     def print_note(self, note_id, gen = 0):
         row = self.query_row(note_id)
         if not row:
             print('Note does not exist: ' + str(note_id))
         else:
+            import pydoc
             pydoc.pipepager(
-                self.note_line() + '\n' + self.note_header() + '\n' + self.note_line() + \
+                self.note_banner() + \
                 '\n' + self.summary_formatted(row, gen) + \
                 '\n' + self.note_line() + \
                 '\n' + row[3] + \
@@ -376,76 +455,71 @@ class Jot:
     def identifier_to_id(self, note_id):
         id_list = [int(x) for x in note_id if str(x).isdigit()]
         alias_list = [x for x in note_id if not str(x).isdigit()]
-        if id_list:
-            sql_id_check = "SELECT notes_id FROM Notes WHERE notes_id IN ({id})".format(id=','.join(['?']*len(id_list)))
-            self.cursor.execute(sql_id_check, id_list) 
-            self.conn.commit()
-            id_list = list(sum(self.cursor.fetchall(), ()))
-        if alias_list:
-            sql_alias_check = "SELECT notes_id FROM Notes WHERE alias IN ({alias})".format(alias=','.join(['?']*len(alias_list)))
-            self.cursor.execute(sql_alias_check, alias_list) 
-            self.conn.commit()
-            a_ids = list(sum(self.cursor.fetchall(), ()))
-            id_list = id_list + a_ids
-        id_list.sort()
-        return(id_list)
+        if not id_list and not alias_list:
+            return([])
+        # ids and aliases are resolved in one statement
+        sql_check = "SELECT notes_id FROM Notes WHERE notes_id IN (SELECT value FROM json_each(?)) \
+        UNION ALL SELECT notes_id FROM Notes WHERE alias IN (SELECT value FROM json_each(?)) \
+        ORDER BY notes_id"
+        return([i[0] for i in self.cursor.execute(sql_check, (json.dumps(id_list), json.dumps(alias_list)))])
         
     def remove_note(self, note_id):
         # may need to be expanded to check other tables?
         print('Deleting note_id = ' + str(note_id))
-        sql_delete_query = "DELETE FROM Notes where notes_id = ?"
-        self.cursor.execute(sql_delete_query, (str(note_id),))
-        self.conn.commit()
-        
-        sql_parents = "Select parent FROM Nest where child = ?"
-        self.cursor.execute(sql_parents, (note_id,))
-        self.conn.commit()
-        parents = self.cursor.fetchall()
-        parents = set(sum(parents, ())) 
-        
-        sql_orphans = "Select child FROM Nest where parent = ?"
-        self.cursor.execute(sql_orphans, (note_id,))
-        self.conn.commit()
-        orphans = self.cursor.fetchall()
-        orphans = set(sum(orphans, ())) 
-        
-        sql_delete_nest = "DELETE FROM Nest WHERE parent = ? OR child = ?"
-        self.cursor.execute(sql_delete_nest, (note_id, note_id))
-        self.conn.commit()
-        
-        if orphans is not None and parents is not None:
+        with self.conn: # one transaction for the delete and the re-nesting
+            sql_delete_query = "DELETE FROM Notes where notes_id = ?"
+            self.cursor.execute(sql_delete_query, (str(note_id),))
+            
+            sql_parents = "Select parent FROM Nest where child = ?"
+            parents = {i[0] for i in self.cursor.execute(sql_parents, (note_id,))}
+            
+            sql_orphans = "Select child FROM Nest where parent = ?"
+            orphans = {i[0] for i in self.cursor.execute(sql_orphans, (note_id,))}
+            
+            self.tree = None
+            sql_delete_nest = "DELETE FROM Nest WHERE parent = ? OR child = ?"
+            self.cursor.execute(sql_delete_nest, (note_id, note_id))
+            
+            self.row_cache.pop(note_id, None)
+            adoptions = [(parent, orphan) for parent in parents for orphan in orphans]
             sql_adopt = 'INSERT INTO Nest (parent, child) VALUES (?, ?)'
-            for parent in parents:
-                for orphan in orphans:
-                    self.cursor.execute(sql_adopt, (parent, orphan))
-                    self.conn.commit()
-                    print(str(parent) + ' adopted ' + str(orphan))
+            self.cursor.executemany(sql_adopt, adoptions)
+        for parent, orphan in adoptions:
+            print(str(parent) + ' adopted ' + str(orphan))
     
     def input_note(self, description, status_id, due, priority, alias, note_id, parent_id):
         if len(note_id) > 1 or str(alias).isdigit():
             print("You cannot assign an alias to multiple ids as once; alias cannot be a number")
             alias = None
-        sql_alias_check = 'SELECT EXISTS(SELECT 1 FROM Notes WHERE alias = ?);'
-        self.cursor.execute(sql_alias_check, (alias,))
-        self.conn.commit()
-        if str(sum(self.cursor.fetchall(), ())[0]) == "1":
-            print("Alias NOT ACCEPTED: '" + alias + "' is already in use")
-            alias = None
-        elif alias is None:
+        if alias is None:
             print("No Alias Provided")
-        else:
-            print("Alias '" + alias + "' is accepted")
-
+        # uniqueness of the alias is enforced by the uniq_notes_alias index when the note is written
         longEntryFormat = description == "<long-entry-note>"
         if due == "0001-01-01":
             due = None
         if not note_id:
             self.add_note(description, status_id, due, priority, alias, parent_id, longEntryFormat)
         else:
-            for i in note_id:
-                self.edit_note(description, status_id, due, priority, alias, int(i), parent_id, longEntryFormat)
+            # every edit, and the nesting change, is written in one transaction
+            note_id = [int(i) for i in note_id]
+            edits = [self.edit_note(description, status_id, due, priority, alias, i, longEntryFormat) for i in note_id]
+            sql = 'UPDATE Notes SET status_id = ?, due = ?, description = ?, modified_at = ?, priority = ?, alias = coalesce(?, alias) WHERE notes_id = ?'
+            with self.conn:
+                try:
+                    self.cursor.executemany(sql, edits)
+                    if alias is not None:
+                        print("Alias '" + alias + "' is accepted")
+                except sqlite3.IntegrityError: # only the alias can conflict, keep the old one
+                    print("Alias NOT ACCEPTED: '" + alias + "' is already in use")
+                    self.cursor.executemany(sql, [edit[:5] + (None,) + edit[6:] for edit in edits])
+                for i in note_id:
+                    self.row_cache.pop(i, None)
+                    print('Edited note number: ' + str(i))
+                self.nest_parent_child(parent_id, note_id)
     
     def long_entry_note(self, existingNote):
+        import subprocess
+        import tempfile
         f = tempfile.NamedTemporaryFile(mode='w+t', delete=False)
         n = f.name
         f.write(existingNote)
@@ -455,67 +529,82 @@ class Jot:
             note = f.read()
         return(note.rstrip())
     
-    def nest_parent_child(self, parent, child):
-        if parent is not None and child is not None:
+    def nest_parent_child(self, parent, children):
+        # the caller commits; children is a list of note ids
+        children = [(child,) for child in children if child > 0]
+        if parent is not None and children:
+            self.tree = None
             print('parent: ' + str(parent))
-            if parent > 0 and child > 0:
+            if parent > 0:
                 sql_nest = 'INSERT INTO Nest (parent, child) VALUES (?, ?)'
-                self.cursor.execute(sql_nest, (parent, child))
-                self.conn.commit()
+                self.cursor.executemany(sql_nest, [(parent,) + child for child in children])
                 print('Parent defined as: ' + str(parent))
-            elif parent < 0 and child > 0: # remove parent link
+            elif parent < 0: # remove parent link
                 sql_unnest = 'DELETE FROM Nest WHERE parent = ? and child = ?'
-                self.cursor.execute(sql_unnest, (abs(parent), child))
-                self.conn.commit()
+                self.cursor.executemany(sql_unnest, [(abs(parent),) + child for child in children])
                 print('Parent removed ' + str(abs(parent)))
-            elif parent == 0 and child > 0: # remove all parents
+            elif parent == 0: # remove all parents
                 sql_unnest = 'DELETE FROM Nest WHERE child = ?'
-                self.cursor.execute(sql_unnest, (child,))
-                self.conn.commit()
+                self.cursor.executemany(sql_unnest, children)
                 print('All parents removed from note')
     
-    
     def add_note(self, description, status_id, due, priority, alias, parent_id, longEntryFormat):
         if not status_id:
             status_id = 1
         if longEntryFormat:
             description = self.long_entry_note('')
-        sql = 'INSERT INTO Notes (description, status_id, due, priority, alias) VALUES (?, ?, ?, ?, ?)'
-        self.cursor.execute(sql, (description, status_id, due, priority, alias))
-        self.conn.commit()
-        print('Added note number: ' + str(self.cursor.lastrowid))
-        self.nest_parent_child(parent_id, self.cursor.lastrowid)
+        # a taken alias is dropped inside the insert itself (ON CONFLICT DO NOTHING would burn an autoincrement id)
+        sql = 'INSERT INTO Notes (description, status_id, due, priority, alias) \
+        VALUES (?, ?, ?, ?, (SELECT ? WHERE NOT EXISTS (SELECT 1 FROM Notes WHERE alias = ?)))'
+        with self.conn:
+            self.cursor.execute(sql, (description, status_id, due, priority, alias, alias))
+            note_id = self.cursor.lastrowid # not RETURNING, which needs sqlite 3.35+
+            new_alias = self.cursor.execute('SELECT alias FROM Notes WHERE notes_id = ?', (note_id,)).fetchone()[0]
+            if alias is not None:
+                print("Alias '" + alias + "' is accepted" if new_alias else "Alias NOT ACCEPTED: '" + alias + "' is already in use")
+            self.row_cache.pop(note_id, None)
+            print('Added note number: ' + str(note_id))
+            self.nest_parent_child(parent_id, [note_id])
     
-    def edit_note(self, description, status_id, due, priority, alias, note_id, parent_id, longEntryFormat):
+    def edit_note(self, description, status_id, due, priority, alias, note_id, longEntryFormat):
+        # returns the UPDATE parameters for one note; input_note writes them all at once
         sql_old = 'SELECT * FROM Notes where notes_id = ?'
         self.cursor.execute(sql_old, (str(note_id),))
         row = self.cursor.fetchone()
         if longEntryFormat:
             description = self.long_entry_note(str(row[3]))
-        new_row = (
-                row[0],
+        return (
                 status_id if status_id is not None else row[1],
                 due if due is not None else row[2],
                 description if description is not None else row[3],
-                row[4],
-                datetime.strftime(datetime.now(), "%Y-%m-%d %H:%M:%S"),
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 priority if priority is not None else row[6],
-                alias if alias is not None else row[7]
+                alias, # None keeps the current alias
+                row[0]
                 )
-        sql = 'INSERT or REPLACE into Notes VALUES (?, ?, ?, ?, ?, ?, ?, ?)'
-        self.cursor.execute(sql, new_row)
-        self.conn.commit()
-        print('Edited note number: ' + str(self.cursor.lastrowid))
-        self.nest_parent_child(parent_id, note_id)
     
     def valid_date(self, s):
         try:
-            return datetime.strftime(datetime.strptime(s, "%Y-%m-%d"), "%Y-%m-%d")
+            return datetime.strptime(s, "%Y-%m-%d").date().isoformat() # normalises e.g. 2024-5-1 to 2024-05-01
         except ValueError:
+            import argparse
             msg = "not a valid date: {0!r}".format(s)
             raise argparse.ArgumentTypeError(msg)
     
+    def fast_parse(self):
+        # `jot` and `jot <identifier>` are the common calls; answer them without building the argparse parser
+        argv = sys.argv[1:]
+        if len(argv) > 1 or (argv and argv[0].startswith('-')):
+            return None
+        return SimpleNamespace(identifier=argv, verbose=False, note=None, less=False, order='nested', status=None,
+            find=None, date=None, priority=None, alias=None, rm=False, parent=None, dir=None, dbname=None,
+            code=False, readme=False, sqlite=False)
+
     def parse_inputs(self):
+        self.args = self.fast_parse()
+        if self.args:
+            return
+        import argparse
         parser = argparse.ArgumentParser()
         parser.add_argument("identifier", help="Identify note(s) by index or alias", nargs='*')
         parser.add_argument("-v", "--verbose", action = "store_true", help="increase output verbosity")
@@ -537,6 +626,12 @@ class Jot:
         args = parser.parse_args()
         self.args = args if args else ''
     
+    def needs_db(self):
+        # -h exits inside argparse, the editor commands never read the database and
+        # -dir/-dbname connect in main once the new location is set
+        args = self.args
+        return not (args.code or args.readme or args.sqlite or args.dir or args.dbname)
+
     def main(self):
         args = self.args
         # Set Preferences
@@ -552,13 +647,15 @@ class Jot:
             self.connect()
         # Input
         if args.code or args.readme or args.sqlite:
+            import subprocess
             if args.code:
                 subprocess.call([self.EDITOR, os.path.join(self.JOT_DIR, 'jot.py')])
             if args.readme:
                 subprocess.call([self.EDITOR, os.path.join(self.JOT_DIR, 'README.md')])
             if args.sqlite:
                 subprocess.call([self.EDITOR, os.path.join(self.JOT_DIR, 'create_db.sql')])
-        elif args.note or (args.identifier and (args.status or args.date or args.priority or args.alias or args.parent)):
+            return
+        if args.note or (args.identifier and (args.status or args.date or args.priority or args.alias or args.parent)):
             self.input_note(description=args.note, status_id=args.status, due=args.date, priority=args.priority, alias=args.alias[:5] if args.alias else None, note_id=self.identifier_to_id(args.identifier), parent_id=args.parent)
         elif args.rm:
             [self.remove_note(i) for i in self.identifier_to_id(args.identifier)]